@@ -0,0 +1,8 @@
+import os
+import sys
+
+
+# the sources live in venv/ and read their data files relative to the repository root, like main.py does at runtime
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "venv"))
+os.chdir(root)
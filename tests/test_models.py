@@ -0,0 +1,59 @@
+import models
+import numpy as np
+
+
+def scalar(snowfall_mm: np.ndarray, prev_snow_mm: np.ndarray, temp_c: np.ndarray) -> np.ndarray:
+        return np.array([models.model_a(*sample) for sample in zip(snowfall_mm.ravel(), prev_snow_mm.ravel(), temp_c.ravel())]).reshape(snowfall_mm.shape)
+
+
+def rising(snowfall_mm: float, temp_c: float) -> bool:
+        return models.model_a(snowfall_mm + 1e-9, 0, temp_c) > models.model_a(snowfall_mm, 0, temp_c)
+
+
+def jump(snowfall_low: float, snowfall_high: float, temp_c: float) -> float:
+        # the raw output rises with snowfall and the 0.51-0.85 inversion flips that, so bisect on the slope's direction
+        low_rising = rising(snowfall_low, temp_c)
+        for _ in range(50):
+                middle = (snowfall_low + snowfall_high) / 2
+                if rising(middle, temp_c) == low_rising:
+                        snowfall_low = middle
+                else:
+                        snowfall_high = middle
+        return snowfall_low
+
+
+def test_predict_batch_matches_scalar_on_seeded_grid():
+        generator = np.random.default_rng(20250523)
+        snowfall = generator.uniform(0, 80, (50, 24))
+        prev_snow = generator.uniform(0, 30, (50, 24))
+        temperature = generator.uniform(-30, 15, (50, 24))
+        batch = models.model_a_engine.predict_batch(snowfall, prev_snow, temperature)
+        assert batch.shape == (50, 24)
+        np.testing.assert_allclose(batch, scalar(snowfall, prev_snow, temperature), rtol=0, atol=1e-12)
+
+
+def test_predict_batch_matches_scalar_at_early_exit_cutoff():
+        cutoff_mm = 0.2 * 25.4
+        edges = np.array([np.nextafter(cutoff_mm, 0), cutoff_mm, np.nextafter(cutoff_mm, 100), 0.0])
+        snowfall, prev_snow = np.meshgrid(edges, edges)
+        temperature = np.full(snowfall.shape, -20.0)
+        np.testing.assert_allclose(models.model_a_engine.predict_batch(snowfall, prev_snow, temperature), scalar(snowfall, prev_snow, temperature), rtol=0, atol=1e-12)
+
+
+def test_predict_batch_matches_scalar_at_inversion_edges():
+        # at -20 C with no snow on the ground the output crosses 0.51 near 8.9 mm and 0.85 near 14.1 mm
+        samples: list[float] = []
+        for low, high in ((8.5, 9.5), (13.5, 14.5)):
+                edge = jump(low, high, -20.0)
+                samples.extend((edge - 1e-6, edge + 1e-6))
+        snowfall = np.array(samples)
+        prev_snow = np.zeros_like(snowfall)
+        temperature = np.full_like(snowfall, -20.0)
+        expected = scalar(snowfall, prev_snow, temperature)
+        assert np.any((expected > 0.505) & (expected < 0.51)) and np.any((expected > 0.485) & (expected <= 0.49))
+        assert np.any((expected >= 0.15) & (expected < 0.155)) and np.any((expected > 0.85) & (expected < 0.855))
+        np.testing.assert_allclose(models.model_a_engine.predict_batch(snowfall, prev_snow, temperature), expected, rtol=0, atol=1e-12)
+
+
+def test_predict_matches_model_a():
+        assert abs(models.model_a_engine.predict(20.0, 4.0, -8.0) - models.model_a(20.0, 4.0, -8.0)) < 1e-12
@@ -0,0 +1,70 @@
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
+import numpy as np
+import nws
+import pytest
+
+
+@pytest.fixture
+def center(monkeypatch: pytest.MonkeyPatch) -> datetime:
+        # the saturday before daylight saving ends, so the third school-day window crosses the change
+        forecast_center = nws.est.localize(datetime(2026, 10, 31, 6, 0, 0))
+        monkeypatch.setattr(nws, "forecast_center", forecast_center)
+        return forecast_center
+
+
+def individual(values: list[dict], divide: bool = False) -> nws.IndividualForecast:
+        return nws.IndividualForecast("field", {"field": {"uom": "wmoUnit:unknown", "values": values}}, divide=divide)
+
+
+def summary(center: datetime, precipitation: list[dict], temperature: list[dict], observed_mm: float = 0.0) -> nws.ThreeNumberSummary:
+        forecast = SimpleNamespace(quantitative_precipitation=individual(precipitation, divide=True), temperature=individual(temperature), center=center)
+        observation = {"precipitationLast6Hours": {"unitCode": "wmoUnit:mm", "value": observed_mm, "qualityControl": "V"}}
+        return nws.ThreeNumberSummary(forecast, SimpleNamespace(precipitation_last_6_hours=nws.IndividualObservation("precipitationLast6Hours", observation)))
+
+
+def test_null_values_are_not_covered(center: datetime):
+        temperature = individual([{"validTime": "2026-10-31T06:00:00-04:00/PT8H", "value": None}, {"validTime": "2026-10-31T14:00:00-04:00/PT2H", "value": -4}])
+        sums, counts = temperature.window_sums(np.array([0, 4]), 8)
+        assert sums.tolist() == [0.0, -8.0]
+        assert counts.tolist() == [0, 2]
+
+
+def test_school_days_start_at_local_six_across_daylight_saving(center: datetime):
+        values = [{"validTime": "2026-10-31T06:00:00-04:00/P5D", "value": 1}]
+        school_days = summary(center, values, values).school_day_starts(4)
+        # saturday and sunday are skipped; monday 6 am est is 49 hours after saturday 6 am edt
+        assert school_days == [("2026-11-02", 49), ("2026-11-03", 73)]
+        for _, start in school_days:
+                assert (center + timedelta(hours=start)).astimezone(nws.est).time() == time(6, 0, 0)
+
+
+def test_snow_on_ground_blends_observation_into_forecast(center: datetime):
+        precipitation = [{"validTime": "2026-10-31T06:00:00-04:00/PT12H", "value": 12}]
+        temperature = [{"validTime": "2026-10-31T06:00:00-04:00/PT24H", "value": -5}]
+        _, snow_on_ground, _ = summary(center, precipitation, temperature, observed_mm=6.0).model_a_data_windows(np.arange(8))
+        # 1 mm an hour both observed and forecast, so the lookback total stays at 6 mm as it slides past the center
+        np.testing.assert_allclose(snow_on_ground, 6.0)
+
+
+@pytest.mark.parametrize(("duration", "seconds"), [("P1DT6H", 108000), ("PT30M", 1800), ("PT1,5H", 5400), ("P1W", 604800), ("PT1.5H", 5400), ("P0.5D", 43200)])
+def test_iso_durations(duration: str, seconds: float):
+        assert nws.iso_duration_to_seconds(duration) == seconds
+
+
+def test_iso_duration_rejects_garbage():
+        with pytest.raises(ValueError):
+                nws.iso_duration_to_seconds("1H")
+
+
+def test_valid_time_honours_utc_offset():
+        start, hours = nws.nws_datetime_str_to_datetime_with_duration("2026-10-31T10:00:00+00:00/PT30M")
+        # 10:00 utc is 06:00 edt, and a partial hour still covers the hour it starts in
+        assert start == nws.est.localize(datetime(2026, 10, 31, 6, 0, 0))
+        assert start.utcoffset() == timedelta(hours=-4)
+        assert hours == 1
+
+
+def test_utc_values_land_on_eastern_offsets(center: datetime):
+        temperature = individual([{"validTime": "2026-10-31T10:00:00+00:00/PT2H", "value": -3}])
+        assert temperature.array[:2].tolist() == [[0.0, -3.0], [1.0, -3.0]]
@@ -0,0 +1,150 @@
+from argparse import ArgumentParser
+from datetime import timedelta
+from glob import glob
+from json import dumps, loads
+from os import getcwd, path
+from resource import RUSAGE_SELF, getrusage
+from shutil import copy, rmtree
+from subprocess import run
+from tempfile import mkdtemp
+from time import perf_counter
+from typing import Any, Callable
+import fetch
+import main
+import models
+import numpy as np
+import nws
+import replay
+import sys
+
+
+def best_of(function: Callable[[], Any], repeat: int = 5, number: int = 20) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+                start = perf_counter()
+                for _ in range(number):
+                        function()
+                best = min(best, (perf_counter() - start) / number)
+        return best
+
+
+def synthetic_values(hours: int = 168, step: int = 3) -> list[dict[str, Any]]:
+        values: list[dict[str, Any]] = []
+        for offset in range(-12, hours, step):
+                valid_time = nws.format_datetime(nws.forecast_center + timedelta(hours=offset))
+                values.append({"validTime": f"{valid_time}/PT{step}H", "value": offset % 7 + 0.25})
+        return values
+
+
+def bench_time_series() -> dict[str, float]:
+        values = synthetic_values()
+        fields = 12
+        nws.nws_datetime_str_to_datetime_with_duration.cache_clear()
+        nws.nws_datetime_str_to_datetime.cache_clear()
+        cold = best_of(lambda: nws.time_value_pairs_to_individual_forecast(values, divide=True), repeat=1, number=1)
+        warm = best_of(lambda: nws.time_value_pairs_to_individual_forecast(values, divide=True))
+        forecast = best_of(lambda: [nws.time_value_pairs_to_individual_forecast(values) for _ in range(fields)])
+        return {
+                "values_per_field": len(values),
+                "field_cold_ms": cold * 1000,
+                "field_warm_ms": warm * 1000,
+                "forecast_ms": forecast * 1000
+        }
+
+
+def bench_model_a(windows: int = 100000, calls: int = 2000) -> dict[str, float]:
+        generator = np.random.default_rng(0)
+        snowfall = generator.uniform(0, 60, windows)
+        prev_snow = generator.uniform(0, 30, windows)
+        temperature = generator.uniform(-25, 10, windows)
+        batch = best_of(lambda: models.model_a_engine.predict_batch(snowfall, prev_snow, temperature), repeat=3, number=3)
+        scalar = best_of(lambda: [models.model_a(snowfall[i], prev_snow[i], temperature[i]) for i in range(calls)], repeat=1, number=1)
+        return {
+                "batch_windows_per_second": windows / batch,
+                "scalar_calls_per_second": calls / scalar
+        }
+
+
+def requests_per_second(function: Callable[[], Any], seconds: float = 0.5) -> float:
+        count = 0
+        start = perf_counter()
+        while perf_counter() - start < seconds:
+                function()
+                count += 1
+        return count / (perf_counter() - start)
+
+
+def bench_routes() -> dict[str, dict[str, float]]:
+        main.load_static()
+        client = main.app.test_client()
+        results: dict[str, dict[str, float]] = {}
+        for route in ("/raw.json", "/predictions.json", "/home"):
+                etag = client.get(route).headers["ETag"]
+                results[route] = {
+                        "plain": requests_per_second(lambda: client.get(route)),
+                        "gzip": requests_per_second(lambda: client.get(route, headers={"Accept-Encoding": "gzip"})),
+                        "not_modified": requests_per_second(lambda: client.get(route, headers={"If-None-Match": etag}))
+                }
+        return results
+
+
+def refresh_child() -> dict[str, Any]:
+        # runs inside a scratch workspace whose settings point nws at the synthetic stand-in
+        start = perf_counter()
+        nws.main()
+        cold = perf_counter() - start
+        start = perf_counter()
+        nws.main()
+        warm = perf_counter() - start
+        return {
+                "cold_seconds": cold,
+                "warm_seconds": warm,
+                "nws_requests": sum(fetch.requests_total.values.values()),
+                "routes_per_second": bench_routes(),
+                "peak_rss_mb": getrusage(RUSAGE_SELF).ru_maxrss / 1024
+        }
+
+
+def make_workspace(points: int, latency: float, error_rate: float) -> str:
+        source = getcwd()
+        workspace = mkdtemp(prefix="snowcalc-bench-")
+        for name in ("model-a.json", "nws-headers.json", "special-data.json", "styles.css", *glob("*.html")):
+                copy(path.join(source, name), workspace)
+        with open(path.join(source, "settings.json"), "r") as file:
+                settings = loads(file.read())
+        settings["fetch"]["backoff"] = 0.01
+        settings["scheduler"]["worker_process"] = False
+        settings["profile"]["enabled"] = False
+        settings["replay"] = {"mode": "synthetic", "latency": latency, "error_rate": error_rate, "seed": 0}
+        with open(path.join(workspace, "settings.json"), "w") as file:
+                file.write(dumps(settings, indent=8))
+        with open(path.join(workspace, "points.json"), "w") as file:
+                file.write(dumps([replay.synthetic_point(i) for i in range(points)], indent=8))
+        return workspace
+
+
+def bench_refresh(points: int, latency: float = 0.0, error_rate: float = 0.0) -> dict[str, Any]:
+        # a fresh process per scale keeps caches, built objects and peak rss from leaking between sizes
+        workspace = make_workspace(points, latency, error_rate)
+        try:
+                child = run([sys.executable, path.abspath(__file__), "refresh-child"], cwd=workspace, capture_output=True, text=True, check=True)
+        finally:
+                rmtree(workspace)
+        return {"points": points, **loads(child.stdout)}
+
+
+if __name__ == "__main__":
+        parser = ArgumentParser(description="offline benchmarks; run from the repository root, e.g. python venv/bench.py > bench_output.txt")
+        parser.add_argument("mode", nargs="?", default="all", choices=("all", "refresh-child"))
+        parser.add_argument("--points", type=int, nargs="+", default=[1, 10, 100, 1000])
+        parser.add_argument("--latency", type=float, default=0.0, help="seconds the stand-in waits before each response")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stand-in responses that fail with 503")
+        arguments = parser.parse_args()
+        if arguments.mode == "refresh-child":
+                print(dumps(refresh_child()))
+        else:
+                print(dumps({
+                        "time_series": bench_time_series(),
+                        "model_a": bench_model_a(),
+                        "refresh": [bench_refresh(points, arguments.latency, arguments.error_rate) for points in arguments.points]
+                }, indent=8))
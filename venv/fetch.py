@@ -0,0 +1,244 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from cProfile import Profile
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+from time import perf_counter, sleep
+from typing import Any, Callable, Iterable, Iterator, Self
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+import sys
+
+
+RETRY_STATUS_CODES: frozenset[int] = frozenset((429, 500, 502, 503, 504))
+# only these are asked for again every cycle; bodies of anything else (e.g. one-off /products/{id}) are never reused
+CONDITIONAL_ENDPOINTS: frozenset[str] = frozenset(("gridpoints", "observations"))
+# from 3.12 cProfile sits on sys.monitoring: one profiler sees every thread, and enabling a second one raises
+PROCESS_WIDE_PROFILER: bool = sys.version_info >= (3, 12)
+
+
+request_seconds: metrics.Histogram = metrics.histogram("nws_request_seconds", "Latency of single NWS HTTP requests.", ("endpoint",))
+requests_total: metrics.Counter = metrics.counter("nws_requests_total", "NWS HTTP requests by endpoint and status.", ("endpoint", "status"))
+response_bytes_total: metrics.Counter = metrics.counter("nws_response_bytes_total", "Body bytes received from NWS.", ("endpoint",))
+stage_seconds: metrics.Histogram = metrics.histogram("refresh_stage_seconds", "Duration of refresh pipeline stages.", ("stage",))
+stage_failures_total: metrics.Counter = metrics.counter("refresh_stage_failures_total", "Refresh pipeline stages that raised.", ("stage",))
+
+
+class BadResponse(Exception):
+        def __init__(self: Self, status_code: int, url: str = ""):
+                super().__init__(f"{status_code} {url}".rstrip())
+                self.status_code: int = status_code
+                self.url: str = url
+
+
+def endpoint_name(url: str) -> str:
+        # collapse ids and coordinates out of the path so every location shares one label per endpoint
+        parts = urlsplit(url).path.strip("/").split("/")
+        if parts[0] == "gridpoints":
+                return "gridpoints/stations" if parts[-1] == "stations" else "gridpoints"
+        if parts[0] == "stations":
+                return "observations"
+        if parts[0] == "products" and len(parts) > 1:
+                return "product"
+        return parts[0] or "root"
+
+
+def provided(value: Any) -> Future:
+        future: Future = Future()
+        future.set_result(value)
+        return future
+
+
+class StageTimings(object):
+        def __init__(self: Self):
+                self.lock: Lock = Lock()
+                self.stages: dict[str, list[float]] = {}
+
+        def record(self: Self, stage: str, seconds: float):
+                with self.lock:
+                        self.stages.setdefault(stage, []).append(seconds)
+
+        def reset(self: Self):
+                with self.lock:
+                        self.stages = {}
+
+        def dictify(self: Self) -> dict[str, dict[str, float]]:
+                with self.lock:
+                        stages = {stage: list(seconds) for stage, seconds in self.stages.items()}
+                return {
+                        stage: {
+                                "count": len(seconds),
+                                "total": sum(seconds),
+                                "mean": sum(seconds) / len(seconds),
+                                "max": max(seconds)
+                        } for stage, seconds in stages.items()
+                }
+
+
+class Fetcher(object):
+        def __init__(self: Self, max_workers: int = 16, per_host_limit: int = 8, retries: int = 3, backoff: float = 0.5, timeout: float = 15):
+                self.per_host_limit: int = per_host_limit
+                self.retries: int = retries
+                self.backoff: float = backoff
+                self.timeout: float = timeout
+                self.session: requests.Session = requests.Session()
+                # anything else mounted on the session (e.g. the recording adapter) has to size its pools the same way
+                self.pool_options: dict[str, int] = {"pool_connections": 4, "pool_maxsize": max(per_host_limit, max_workers)}
+                adapter = HTTPAdapter(**self.pool_options)
+                self.session.mount("https://", adapter)
+                self.session.mount("http://", adapter)
+                self.host_lock: Lock = Lock()
+                self.host_semaphores: dict[str, BoundedSemaphore] = {}
+                self.memo_lock: Lock = Lock()
+                self.memo: dict[str, Future] = {}
+                # etag, last-modified and body of the last 200 per url, kept across cycles for conditional requests
+                self.validator_lock: Lock = Lock()
+                self.validators: dict[str, tuple[str | None, str | None, dict[Any, Any]]] = {}
+                self.requested: set[str] = set()
+                # locations wait on requests, requests never wait on anything, so they get separate pools
+                self.request_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers, thread_name_prefix="nws-request")
+                self.location_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers, thread_name_prefix="nws-location")
+                self.timings: StageTimings = StageTimings()
+                self.profiles: list[Profile] | None = None
+
+        def begin_cycle(self: Self, profile: bool = False):
+                self.end_cycle()
+                with self.memo_lock:
+                        self.memo = {}
+                # urls nobody asked for last cycle (dropped points, moved stations) are not coming back, so let their bodies go
+                with self.validator_lock:
+                        self.validators = {url: validator for url, validator in self.validators.items() if url in self.requested}
+                        self.requested = set()
+                self.timings.reset()
+                self.profiles = [] if profile else None
+                if profile and PROCESS_WIDE_PROFILER:
+                        cycle_profile = Profile()
+                        cycle_profile.enable()
+                        self.profiles.append(cycle_profile)
+
+        def end_cycle(self: Self):
+                # stops the cycle-wide profile; per-task profiles are already stopped, and disabling them again is harmless
+                for profile in self.profiles or []:
+                        profile.disable()
+
+        def host_semaphore(self: Self, url: str) -> BoundedSemaphore:
+                host = urlsplit(url).netloc
+                with self.host_lock:
+                        if host not in self.host_semaphores:
+                                self.host_semaphores[host] = BoundedSemaphore(self.per_host_limit)
+                        return self.host_semaphores[host]
+
+        @contextmanager
+        def stage(self: Self, name: str) -> Iterator[None]:
+                start = perf_counter()
+                try:
+                        yield
+                except Exception as exception:
+                        stage_failures_total.inc(name)
+                        exception.add_note(f"in refresh stage {name}")
+                        raise
+                finally:
+                        seconds = perf_counter() - start
+                        self.timings.record(name, seconds)
+                        stage_seconds.observe(seconds, name)
+
+        def timed(self: Self, name: str, function: Callable[..., Any], *args: Any) -> Any:
+                profiles = self.profiles
+                if profiles is None or PROCESS_WIDE_PROFILER:
+                        with self.stage(name):
+                                return function(*args)
+                # before 3.12 cProfile only sees the thread it runs in, so each pooled task gets its own profile to merge at the end
+                profile = Profile()
+                with self.stage(name):
+                        try:
+                                return profile.runcall(function, *args)
+                        finally:
+                                profiles.append(profile)
+
+        def submit(self: Self, name: str, function: Callable[..., Any], *args: Any) -> Future:
+                return self.request_executor.submit(self.timed, name, function, *args)
+
+        def map_locations(self: Self, function: Callable[[Any], Any], items: Iterable[Any]) -> list[Any]:
+                futures = [self.location_executor.submit(self.timed, "location", function, item) for item in items]
+                return [future.result() for future in futures]
+
+        def get_json(self: Self, url: str, headers: dict[str, str]) -> dict[Any, Any]:
+                with self.memo_lock:
+                        future = self.memo.get(url)
+                        owner = future is None
+                        if owner:
+                                future = Future()
+                                self.memo[url] = future
+                if not owner:
+                        return future.result()
+                try:
+                        data = self.fetch_json(url, headers)
+                except BaseException as exception:
+                        with self.memo_lock:
+                                self.memo.pop(url, None)
+                        future.set_exception(exception)
+                        raise
+                future.set_result(data)
+                return data
+
+        def conditional_headers(self: Self, url: str, headers: dict[str, str]) -> tuple[dict[str, str], dict[Any, Any] | None]:
+                if endpoint_name(url) not in CONDITIONAL_ENDPOINTS:
+                        return headers, None
+                with self.validator_lock:
+                        self.requested.add(url)
+                        validator = self.validators.get(url)
+                if validator is None:
+                        return headers, None
+                etag, last_modified, data = validator
+                headers = dict(headers)
+                if etag is not None:
+                        headers["If-None-Match"] = etag
+                if last_modified is not None:
+                        headers["If-Modified-Since"] = last_modified
+                return headers, data
+
+        def remember(self: Self, url: str, response: requests.Response, data: dict[Any, Any]):
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if (etag is None and last_modified is None) or endpoint_name(url) not in CONDITIONAL_ENDPOINTS:
+                        return
+                with self.validator_lock:
+                        self.validators[url] = (etag, last_modified, data)
+
+        def fetch_json(self: Self, url: str, headers: dict[str, str]) -> dict[Any, Any]:
+                headers, previous = self.conditional_headers(url, headers)
+                attempt = 0
+                while True:
+                        try:
+                                endpoint = endpoint_name(url)
+                                semaphore = self.host_semaphore(url)
+                                # queueing behind the per-host limit is its own stage, so request latency is only time on the wire
+                                with self.stage("request_wait"):
+                                        semaphore.acquire()
+                                try:
+                                        start = perf_counter()
+                                        with self.stage("request"):
+                                                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                                        request_seconds.observe(perf_counter() - start, endpoint)
+                                finally:
+                                        semaphore.release()
+                                requests_total.inc(endpoint, str(response.status_code))
+                                response_bytes_total.inc(endpoint, amount=len(response.content))
+                                if response.status_code == 304 and previous is not None:
+                                        # the very same object comes back, so callers can tell nothing changed
+                                        return previous
+                                if response.status_code == 200:
+                                        data = response.json()
+                                        self.remember(url, response, data)
+                                        return data
+                                raise BadResponse(response.status_code, url)
+                        except BadResponse as exception:
+                                if exception.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                                        raise
+                        except (requests.ConnectionError, requests.Timeout) as exception:
+                                requests_total.inc(endpoint_name(url), type(exception).__name__)
+                                if attempt >= self.retries:
+                                        raise
+                        sleep(self.backoff * 2 ** attempt)
+                        attempt += 1
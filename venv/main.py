@@ -0,0 +1,168 @@
+from flask import Flask, Response, g, request
+from json import dumps, loads
+from scheduler import Scheduler, WorkerJob, refresh_cycle
+from time import perf_counter
+from typing import Any, Callable
+import metrics
+import snapshots
+
+
+app: Flask = Flask(__name__)
+http_request_seconds: metrics.Histogram = metrics.histogram("http_request_seconds", "Latency of Flask routes.", ("route",), (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+http_requests_total: metrics.Counter = metrics.counter("http_requests_total", "Flask responses by route and status.", ("route", "status"))
+
+
+def get_settings() -> dict[Any, Any]:
+        with open("settings.json", "r") as file:
+                return loads(file.read())
+
+
+static_files: tuple[str, ...] = ("about.html", "documentation.html", "endpoints.html", "home.html", "points.json", "settings.json", "special-data.json", "styles.css")
+
+
+def publish_outputs():
+        # the worker process has already swapped the files into place, so reading them back sees complete payloads
+        for path in ("raw.json", "summary.json", "predictions.json"):
+                snapshots.publish_file(path)
+
+
+def make_scheduler(settings: dict[str, Any]) -> Scheduler:
+        options = settings.get("scheduler", {})
+        job: Callable[[], Any] = refresh_cycle
+        if options.get("worker_process", False):
+                job = WorkerJob(publish_outputs)
+        return Scheduler(job, interval=settings["seconds_between_refresh"], offset=options.get("offset", 300), jitter=options.get("jitter", 30),
+                         decision_hour=options.get("decision_hour", 6), decision_lead=options.get("decision_lead", 900))
+
+
+# only built under __main__: a spawned worker imports this module as __mp_main__ and must not get its own scheduler
+scheduler: Scheduler | None = None
+
+
+@app.before_request
+def start_timer():
+        g.start = perf_counter()
+
+
+@app.after_request
+def record_request(response: Response) -> Response:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        http_request_seconds.observe(perf_counter() - g.start, route)
+        http_requests_total.inc(route, str(response.status_code))
+        return response
+
+
+def load_static():
+        for path in static_files:
+                snapshots.publish_file(path)
+
+
+def serve(name: str) -> Response:
+        snapshot = snapshots.get(name)
+        if snapshot is None:
+                # refresh output that has not been published yet falls back to whatever the last run left on disk
+                snapshot = snapshots.publish_file(name)
+        encoding = "identity"
+        body = snapshot.body
+        if snapshot.brotli is not None and request.accept_encodings["br"]:
+                encoding, body = "br", snapshot.brotli
+        elif request.accept_encodings["gzip"]:
+                encoding, body = "gzip", snapshot.gzip
+        headers = {
+                "ETag": snapshot.etags[encoding],
+                "Last-Modified": snapshot.last_modified,
+                "Cache-Control": "no-cache",
+                "Vary": "Accept-Encoding"
+        }
+        if encoding != "identity":
+                headers["Content-Encoding"] = encoding
+        if request.if_none_match:
+                not_modified = request.if_none_match.contains_raw(snapshot.etags[encoding])
+        else:
+                not_modified = request.if_modified_since is not None and request.if_modified_since.timestamp() >= int(snapshot.modified)
+        if not_modified:
+                headers.pop("Content-Encoding", None)
+                return Response(status=304, headers=headers)
+        return Response(body, headers=headers, content_type=snapshot.content_type)
+
+
+@app.route("/about.html")
+def route_about() -> Response:
+        return serve("about.html")
+
+
+@app.route("/documentation.html")
+def route_documentation() -> Response:
+        return serve("documentation.html")
+
+
+@app.route("/endpoints.html")
+def route_endpoints() -> Response:
+        return serve("endpoints.html")
+
+
+@app.route("/")
+@app.route("/home")
+def route_home() -> Response:
+        return serve("home.html")
+
+
+@app.route("/metrics")
+def route_metrics() -> Response:
+        body = metrics.render()
+        if scheduler is not None and isinstance(scheduler.job, WorkerJob):
+                # refresh-side families only ever get samples in the worker, so the two halves never overlap
+                body += scheduler.job.metrics
+        return Response(body, content_type="text/plain; version=0.0.4; charset=utf-8", headers={"Cache-Control": "no-store"})
+
+
+@app.route("/points.json")
+def route_points() -> Response:
+        return serve("points.json")
+
+
+@app.route("/predicitons.json")
+@app.route("/predictions.json")
+def route_predictions() -> Response:
+        return serve("predictions.json")
+
+
+@app.route("/raw.json")
+def route_raw() -> Response:
+        return serve("raw.json")
+
+
+@app.route("/settings.json")
+def route_settings() -> Response:
+        return serve("settings.json")
+
+
+@app.route("/special-data.json")
+def route_special_data() -> Response:
+        return serve("special-data.json")
+
+
+@app.route("/styles.css")
+def route_styles() -> Response:
+        return serve("styles.css")
+
+
+@app.route("/status.json")
+def route_status() -> Response:
+        status = scheduler.status() if scheduler is not None else {}
+        return Response(dumps(status), content_type="application/json", headers={"Cache-Control": "no-store"})
+
+
+@app.route("/summary.json")
+def route_summary() -> Response:
+        return serve("summary.json")
+
+
+if __name__ == "__main__":
+        settings = get_settings()
+        load_static()
+        scheduler = make_scheduler(settings)
+        scheduler.start()
+        # the reloader would fork a second copy of the scheduler
+        app.run(debug=settings.get("debug", False), use_reloader=False, threaded=True)
+        scheduler.stop()        
@@ -0,0 +1,105 @@
+from concurrent.futures import Future
+from json import dumps, loads
+from os import fdopen, path, replace, stat
+from tempfile import mkstemp
+from threading import Lock
+from time import time
+from typing import Any, Callable, Self
+import metrics
+
+
+lookups_total: metrics.Counter = metrics.counter("metadata_cache_lookups_total", "Metadata cache lookups by kind and result.", ("kind", "result"))
+
+
+class MetadataCache(object):
+        def __init__(self: Self, path: str, ttls: dict[str, float], submit: Callable[..., Future]):
+                self.path: str = path
+                self.ttls: dict[str, float] = ttls
+                self.submit: Callable[..., Future] = submit
+                self.lock: Lock = Lock()
+                self.dirty: bool = False
+                self.revalidating: set[tuple[str, str]] = set()
+                self.mtime: float | None = None
+                self.entries: dict[str, dict[str, dict[str, Any]]] = self.load()
+
+        def file_mtime(self: Self) -> float | None:
+                try:
+                        return stat(self.path).st_mtime
+                except FileNotFoundError:
+                        return None
+
+        def load(self: Self) -> dict[str, dict[str, dict[str, Any]]]:
+                self.mtime = self.file_mtime()
+                try:
+                        with open(self.path, "r") as file:
+                                return loads(file.read())
+                except (FileNotFoundError, ValueError):
+                        return {}
+
+        def reload_if_changed(self: Self):
+                # another writer (python nws.py invalidate) replaced the file; it wins over whatever this process holds
+                if self.file_mtime() == self.mtime:
+                        return
+                with self.lock:
+                        self.entries = self.load()
+                        self.dirty = False
+
+        def flush(self: Self):
+                with self.lock:
+                        if not self.dirty:
+                                return
+                        contents = dumps(self.entries)
+                        self.dirty = False
+                # write then rename so a crash mid-write never leaves a truncated cache behind; each writer gets its own
+                # temporary file so the server and the invalidate command never write into the same one
+                descriptor, temporary = mkstemp(prefix=f"{path.basename(self.path)}.", suffix=".tmp", dir=path.dirname(path.abspath(self.path)))
+                with fdopen(descriptor, "w") as file:
+                        file.write(contents)
+                replace(temporary, self.path)
+                self.mtime = self.file_mtime()
+
+        def store(self: Self, kind: str, key: str, value: dict[str, Any]) -> dict[str, Any]:
+                with self.lock:
+                        self.entries.setdefault(kind, {})[key] = {"stored": time(), "value": value}
+                        self.dirty = True
+                return value
+
+        def lookup(self: Self, kind: str, key: str, fetch: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+                with self.lock:
+                        entry = self.entries.get(kind, {}).get(key)
+                if entry is None:
+                        lookups_total.inc(kind, "miss")
+                        return self.store(kind, key, fetch())
+                if time() - entry["stored"] > self.ttls.get(kind, 0):
+                        lookups_total.inc(kind, "stale")
+                        self.revalidate(kind, key, fetch)
+                else:
+                        lookups_total.inc(kind, "hit")
+                return entry["value"]
+
+        def revalidate(self: Self, kind: str, key: str, fetch: Callable[[], dict[str, Any]]):
+                with self.lock:
+                        if (kind, key) in self.revalidating:
+                                return
+                        self.revalidating.add((kind, key))
+
+                def run():
+                        try:
+                                self.store(kind, key, fetch())
+                        finally:
+                                with self.lock:
+                                        self.revalidating.discard((kind, key))
+
+                # stale entries keep being served until the refetch lands; a failed refetch just leaves them stale
+                self.submit(f"revalidate_{kind}", run)
+
+        def invalidate(self: Self, key: str | None = None, kind: str | None = None):
+                with self.lock:
+                        for cached_kind, entries in self.entries.items():
+                                if kind is not None and cached_kind != kind:
+                                        continue
+                                if key is None:
+                                        entries.clear()
+                                else:
+                                        entries.pop(key, None)
+                        self.dirty = True
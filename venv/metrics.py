@@ -0,0 +1,95 @@
+from bisect import bisect_left
+from threading import Lock
+from typing import Self
+
+
+default_buckets: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+        if extra:
+                pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(object):
+        kind: str = "counter"
+
+        def __init__(self: Self, name: str, description: str, labels: tuple[str, ...] = ()):
+                self.name: str = name
+                self.description: str = description
+                self.labels: tuple[str, ...] = labels
+                self.lock: Lock = Lock()
+                self.values: dict[tuple[str, ...], float] = {}
+
+        def inc(self: Self, *label_values: str, amount: float = 1):
+                with self.lock:
+                        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+        def samples(self: Self) -> list[str]:
+                with self.lock:
+                        values = dict(self.values)
+                return [f"{self.name}{format_labels(self.labels, key)} {value}" for key, value in values.items()]
+
+
+class Histogram(object):
+        kind: str = "histogram"
+
+        def __init__(self: Self, name: str, description: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = default_buckets):
+                self.name: str = name
+                self.description: str = description
+                self.labels: tuple[str, ...] = labels
+                self.buckets: tuple[float, ...] = buckets
+                self.lock: Lock = Lock()
+                # per label set: a count per bucket (the last one is +Inf), then the running sum
+                self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+        def observe(self: Self, value: float, *label_values: str):
+                index = bisect_left(self.buckets, value)
+                with self.lock:
+                        counts, total = self.values.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+                        counts[index] += 1
+                        total[0] += value
+
+        def samples(self: Self) -> list[str]:
+                with self.lock:
+                        values = {key: (list(counts), total[0]) for key, (counts, total) in self.values.items()}
+                lines: list[str] = []
+                for key, (counts, total) in values.items():
+                        cumulative = 0
+                        for bound, count in zip((*self.buckets, "+Inf"), counts):
+                                cumulative += count
+                                le = f'le="{bound}"'
+                                lines.append(f"{self.name}_bucket{format_labels(self.labels, key, le)} {cumulative}")
+                        lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {total}")
+                        lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+                return lines
+
+
+registry: list[Counter | Histogram] = []
+
+
+def counter(name: str, description: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, description, labels)
+        registry.append(metric)
+        return metric
+
+
+def histogram(name: str, description: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = default_buckets) -> Histogram:
+        metric = Histogram(name, description, labels, buckets)
+        registry.append(metric)
+        return metric
+
+
+def render() -> str:
+        lines: list[str] = []
+        for metric in registry:
+                samples = metric.samples()
+                # families with nothing recorded are left out, so a worker process's families never collide with empty local ones
+                if not samples:
+                        continue
+                lines.append(f"# HELP {metric.name} {metric.description}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(samples)
+        return "\n".join(lines) + "\n" if lines else ""
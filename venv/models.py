@@ -0,0 +1,93 @@
+from json import loads
+from typing import Any, Self
+import numpy as np
+
+
+# declan if ur reading this, why the hell is the model trained in imperial units?
+# every time one of these metric to imperial conversion functions ends up on the call stack i hope every one of your toes meets some hardwood furniture at a velocity measured in a 3d vector of floats measured in ft/sec
+
+
+def c_to_f(c: float) -> float:
+        return c * 9/5 + 32
+
+
+def mm_to_in(mm: float) -> float:
+        return mm / 25.4
+
+
+with open("model-a.json", "r") as file:
+        model_a_parameters: dict[Any, Any] = loads(file.read())
+
+
+def sigmoid(z: Any):
+        return 1 / (1 + np.exp(-z))
+
+
+def model_a(snowfall_mm: float, prev_snow_mm: float, temp_c: float) -> float:
+        snowfall_in = mm_to_in(snowfall_mm)
+        prev_snow_in = mm_to_in(prev_snow_mm)
+        temp_f = c_to_f(temp_c)
+
+        if snowfall_in < 0.2 and prev_snow_in < 0.2:
+                return 0.0
+
+        temp_f = max(temp_f, 10)
+
+        initial_vector = np.array((snowfall_in, prev_snow_in, temp_f, 1))
+        means_vector = np.array((*model_a_parameters["means"], 0))
+        stdevs_vector = np.array((*model_a_parameters["stdevs"], 1))
+        adjusted_vector = (initial_vector - means_vector) / stdevs_vector
+
+        fc1_vector = np.array(model_a_parameters["fc1_weights"])
+        z1_vector = np.dot(fc1_vector, adjusted_vector)
+
+        swiglu_out_vector = np.append(z1_vector[:25] * sigmoid(z1_vector[25:]), 1.0)
+        fc2_vector = np.array(model_a_parameters["fc2_weights"])
+        z2_scalar = np.dot(fc2_vector, swiglu_out_vector)
+
+        prediction = sigmoid(z2_scalar)
+
+        if 0.51 <= prediction <= 0.85:
+                prediction = 1 - prediction
+
+        return min(prediction, 0.99) 
+
+
+
+class ModelA(object):
+        def __init__(self: Self, parameters: dict[Any, Any]):
+                means = np.array(parameters["means"], dtype=np.float64)
+                stdevs = np.array(parameters["stdevs"], dtype=np.float64)
+                fc1 = np.array(parameters["fc1_weights"], dtype=np.float64)
+                fc2 = np.array(parameters["fc2_weights"], dtype=np.float64)
+                # standardization is folded into fc1 so a batch is one matmul: W((x - m) / s) + b == (W / s)x + (b - W(m / s))
+                self.fc1_weights: np.ndarray[Any, Any] = np.ascontiguousarray((fc1[:, :3] / stdevs).T)
+                self.fc1_bias: np.ndarray[Any, Any] = np.ascontiguousarray(fc1[:, 3] - fc1[:, :3] @ (means / stdevs))
+                self.fc2_weights: np.ndarray[Any, Any] = np.ascontiguousarray(fc2[:25])
+                self.fc2_bias: float = float(fc2[25])
+
+        def predict(self: Self, snowfall_mm: float, prev_snow_mm: float, temp_c: float) -> float:
+                return float(self.predict_batch(snowfall_mm, prev_snow_mm, temp_c))
+
+        def predict_batch(self: Self, snowfall_mm: Any, prev_snow_mm: Any, temp_c: Any) -> np.ndarray[Any, Any]:
+                snowfall_in, prev_snow_in, temp_c = np.broadcast_arrays(mm_to_in(np.asarray(snowfall_mm, dtype=np.float64)), mm_to_in(np.asarray(prev_snow_mm, dtype=np.float64)), np.asarray(temp_c, dtype=np.float64))
+                predictions = np.zeros(snowfall_in.shape, dtype=np.float64)
+                live = (snowfall_in >= 0.2) | (prev_snow_in >= 0.2)
+                if not live.any():
+                        return predictions
+
+                inputs = np.empty((int(live.sum()), 3), dtype=np.float64)
+                inputs[:, 0] = snowfall_in[live]
+                inputs[:, 1] = prev_snow_in[live]
+                inputs[:, 2] = np.maximum(c_to_f(temp_c[live]), 10)
+
+                z1 = inputs @ self.fc1_weights + self.fc1_bias
+                swiglu_out = z1[:, :25] * sigmoid(z1[:, 25:])
+                prediction = sigmoid(swiglu_out @ self.fc2_weights + self.fc2_bias)
+
+                prediction = np.where((prediction >= 0.51) & (prediction <= 0.85), 1 - prediction, prediction)
+                predictions[live] = np.minimum(prediction, 0.99)
+                return predictions
+
+
+model_a_engine: ModelA = ModelA(model_a_parameters)
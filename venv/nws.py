@@ -0,0 +1,715 @@
+from datetime import datetime, time, timedelta
+from fetch import BadResponse, Fetcher, provided
+from functools import cache, lru_cache
+from math import ceil
+from json import dumps, loads
+from metadata import MetadataCache
+from pstats import Stats
+from models import *
+from snapshots import publish, write_atomic
+from pytz import timezone
+from threading import Lock
+from typing import Any, Callable, Self, TypeVar
+import re
+import metrics
+import models
+import replay
+import sys
+import numpy as np
+
+
+est = timezone('US/Eastern')
+
+
+T = TypeVar("T")
+
+
+fetcher: Fetcher | None = None
+metadata_cache: MetadataCache | None = None
+built_lock: Lock = Lock()
+built: dict[str, tuple[Any, Any]] = {}
+built_requested: set[str] = set()
+built_locations: dict[str, "Location"] = {}
+built_total: metrics.Counter = metrics.counter("built_objects_total", "Forecasts, observations and locations rebuilt or reused from the last cycle.", ("kind", "result"))
+predictions_total: metrics.Counter = metrics.counter("model_a_predictions_total", "Windows scored by model_a.")
+
+
+def get_fetcher() -> Fetcher:
+        global fetcher
+        if fetcher is None:
+                settings = get_settings()
+                fetcher = Fetcher(**settings.get("fetch", {}))
+                replay.install(fetcher.session, settings.get("replay", {}), fetcher.pool_options)
+        return fetcher
+
+
+def get_metadata_cache() -> MetadataCache:
+        global metadata_cache
+        if metadata_cache is None:
+                settings = get_settings().get("metadata_cache", {})
+                metadata_cache = MetadataCache(settings.get("path", "metadata-cache.json"), settings.get("ttls", {}), get_fetcher().submit)
+        return metadata_cache
+
+
+def cached_grid_data(latlon: "Point") -> "Gridpoint":
+        data = get_metadata_cache().lookup("grid_data", latlon.latlon_str, lambda: latlon.get_grid_data().dictify())
+        return Gridpoint.undictify(data)
+
+
+def cached_station(latlon: "Point", grid_data: "Gridpoint") -> "Station":
+        data = get_metadata_cache().lookup("station", latlon.latlon_str, lambda: grid_data.get_station().dictify())
+        return Station.undictify(data)
+
+
+def cached_zone(latlon: "Point") -> "Zone":
+        data = get_metadata_cache().lookup("zone", latlon.latlon_str, lambda: latlon.get_zone().dictify())
+        return Zone.undictify(data)
+
+
+def invalidate_metadata(latlon_str: str | None = None, kind: str | None = None):
+        cache = get_metadata_cache()
+        cache.invalidate(latlon_str, kind)
+        cache.flush()
+
+
+def begin_built_cycle():
+        global built, built_requested
+        # like the fetcher's validators: objects for urls nobody asked for last cycle are not coming back
+        with built_lock:
+                built = {url: entry for url, entry in built.items() if url in built_requested}
+                built_requested = set()
+
+
+def reuse_or_build(url: str, version: Any, build: Callable[[], T]) -> T:
+        with built_lock:
+                built_requested.add(url)
+                previous = built.get(url)
+        if previous is not None and previous[0] == version:
+                built_total.inc(type(previous[1]).__name__, "reused")
+                return previous[1]
+        result = build()
+        built_total.inc(type(result).__name__, "built")
+        with built_lock:
+                # when two callers build the same resource at once both must hand back one object, or identity checks miss
+                previous = built.get(url)
+                if previous is not None and previous[0] == version:
+                        return previous[1]
+                built[url] = (version, result)
+        return result
+
+
+def call_json(url: str, headers: dict[str, str]) -> dict[Any, Any]:
+        return get_fetcher().get_json(url, headers)
+
+
+def call_nws(url: str) -> dict[Any, Any]:
+        return call_json(url, get_nws_headers())
+
+
+def format_datetime(datetime_to_convert: datetime):
+        tz_suffix = datetime_to_convert.strftime("%z")
+        tz_suffix = f"{tz_suffix[:3]}:{tz_suffix[3:]}"
+        return datetime_to_convert.strftime("%Y-%m-%dT%H:%M:%S") + tz_suffix
+
+
+def get_forecast_points():
+        with open("points.json", "r") as file:
+                return loads(file.read())
+
+
+@cache
+def get_nws_headers() -> dict[str, str]:
+        with open("nws-headers.json", "r") as file:
+                return loads(file.read())
+
+
+@cache
+def get_prediction_settings() -> dict[str, Any]:
+        return get_settings().get("predictions", {})
+
+
+def get_settings() -> dict[str, Any]:
+        with open("settings.json", "r") as file:
+                return loads(file.read())
+
+
+def get_special_data() -> dict[str, Any]:
+        with open("special-data.json", "r") as file:
+                return loads(file.read())
+
+
+# iso 8601 allows a decimal fraction, with either separator, on any component
+iso_duration = re.compile(r"P(?:(\d+(?:[.,]\d+)?)Y)?(?:(\d+(?:[.,]\d+)?)M)?(?:(\d+(?:[.,]\d+)?)W)?(?:(\d+(?:[.,]\d+)?)D)?(?:T(?:(\d+(?:[.,]\d+)?)H)?(?:(\d+(?:[.,]\d+)?)M)?(?:(\d+(?:[.,]\d+)?)S)?)?")
+
+
+@lru_cache(maxsize=8192)
+def nws_datetime_str_to_datetime(datetime_str: str) -> datetime:
+        # the same handful of timestamps repeats across every field of every location, so parse each once
+        parsed = datetime.fromisoformat(datetime_str)
+        # nws sends utc offsets; a bare clock is taken as eastern
+        if parsed.tzinfo is None:
+                return est.localize(parsed)
+        return parsed.astimezone(est)
+
+
+def iso_duration_to_seconds(duration_str: str) -> float:
+        match = iso_duration.fullmatch(duration_str)
+        if match is None:
+                raise ValueError(f"bad iso 8601 duration: {duration_str}")
+        years, months, weeks, days, hours, minutes, seconds = (float(group.replace(",", ".")) if group else 0.0 for group in match.groups())
+        # nws never sends years or months, but if it did calendar-exact lengths would not matter at hourly resolution
+        return (((years * 365 + months * 30 + weeks * 7 + days) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+@lru_cache(maxsize=8192)
+def nws_datetime_str_to_datetime_with_duration(datetime_str: str) -> tuple[datetime, int]:
+        datetime_isolated, duration_isolated = datetime_str.split("/")
+        # partial hours still cover the hour they start in
+        return nws_datetime_str_to_datetime(datetime_isolated), ceil(iso_duration_to_seconds(duration_isolated) / 3600)
+
+
+def nws_okay() -> bool:
+        try:
+                return call_nws("https://api.weather.gov")["status"] == "OK"
+        except BadResponse:
+                return False
+
+
+def set_forecast_center():
+        # real eastern time whatever the host clock is set to, so this agrees with the scheduler's 6 am decision run
+        now: datetime = datetime.now(est)
+        test: datetime = est.localize(datetime.combine(now.date(), time(6, 0, 0)))
+        if now > test:
+                return est.localize(datetime.combine(now.date() + timedelta(days=1), time(6, 0, 0)))
+        else:
+                return test
+
+
+def hours_after_center(moment: datetime) -> int:
+        delta = moment - forecast_center
+        return delta.days * 24 + delta.seconds // 3600
+
+
+def time_value_pairs_to_individual_forecast(values: list[dict[str, Any]], divide: bool = False, keep_negative: bool = False) -> np.ndarray[Any, Any]:
+        return time_value_pairs_to_dense_forecast(values, divide=divide, keep_negative=keep_negative)[0]
+
+
+def time_value_pairs_to_dense_forecast(values: list[dict[str, Any]], divide: bool = False, keep_negative: bool = False) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+        starts = np.empty(len(values), dtype=np.int64)
+        durations = np.empty(len(values), dtype=np.int64)
+        hourly_values = np.empty(len(values), dtype=np.float64)
+        present = np.empty(len(values), dtype=bool)
+        for i, value in enumerate(values):
+                valid_time, duration = nws_datetime_str_to_datetime_with_duration(value["validTime"])
+                starts[i] = hours_after_center(valid_time)
+                durations[i] = duration
+                present[i] = value["value"] is not None
+                hourly_values[i] = value["value"] if present[i] else 0.0
+        if divide:
+                hourly_values /= np.maximum(durations, 1)
+        if len(values) and durations.any():
+                bottom = int(starts.min()) if keep_negative else 0
+                top = int((starts + durations).max())
+        else:
+                bottom = -1 if keep_negative else 0
+                top = 24
+        # one row per hour from bottom to the end of the horizon, so row i is always offset bottom + i
+        dense = np.zeros((max(top - bottom, 0), 2), dtype=np.float64)
+        dense[:, 0] = np.arange(bottom, bottom + len(dense))
+        # every interval becomes its run of hourly offsets at once: start + 0, start + 1, ... start + duration - 1
+        run_starts = np.repeat(np.cumsum(durations) - durations, durations)
+        offsets = np.repeat(starts, durations) + np.arange(len(run_starts)) - run_starts
+        inside = offsets >= bottom
+        dense[offsets[inside] - bottom, 1] = np.repeat(hourly_values, durations)[inside]
+        # gaps and nulls stay zero in the array, so remember which hours nws actually gave a value for
+        covered = np.zeros(len(dense), dtype=bool)
+        covered[offsets[inside] - bottom] = np.repeat(present, durations)[inside]
+        return dense, covered
+
+
+class Timestamp(object):
+        __timezone = est
+
+        def __init__(self: Self):
+                self.timestamp: datetime = self.__timezone.localize(datetime.now())
+
+        def __str__(self: Self) -> str:
+                return format_datetime(self.timestamp)
+
+
+class IndividualForecast(object):
+        def __init__(self: Self, name: str, json_data: dict[Any, Any], divide: bool = False, keep_negative: bool = False):
+                self.uom: dict[Any, Any] | None
+                try:
+                        self.uom = json_data[name]["uom"]
+                except KeyError:
+                        self.uom = None
+                self.array: np.ndarray[Any, Any]
+                self.covered: np.ndarray[Any, Any]
+                self.array, self.covered = time_value_pairs_to_dense_forecast(json_data[name]["values"], divide=divide, keep_negative=keep_negative)
+                self.divided: bool = divide
+                self.kept_negative: bool = keep_negative
+
+        def horizon(self: Self) -> int:
+                return int(self.array[-1, 0]) + 1 if len(self.array) else 0
+
+        def window_sums(self: Self, starts: np.ndarray[Any, Any], hours: int) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+                cumulative = np.concatenate(((0.0,), np.cumsum(self.array[:, 1], dtype=np.float64)))
+                covered = np.concatenate(((0,), np.cumsum(self.covered, dtype=np.int64)))
+                bottom = int(self.array[0, 0]) if len(self.array) else 0
+                low = np.clip(starts - bottom, 0, len(self.array))
+                high = np.clip(starts + hours - bottom, 0, len(self.array))
+                # the second result counts only hours with a value, so means skip gaps instead of averaging in zeros
+                return cumulative[high] - cumulative[low], covered[high] - covered[low]
+
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "uom": self.uom,
+                        "array": [[int(offset), float(value)] for offset, value in self.array.tolist()],
+                        "divided": self.divided,
+                        "kept_negative": self.kept_negative
+                }
+
+
+class Forecast(object):
+        def __init__(self: Self, json_data: dict[Any, Any]):
+                self.timestamp: Timestamp = Timestamp()
+                self.update_time: str = json_data["updateTime"]
+                self.temperature: IndividualForecast = IndividualForecast("temperature", json_data)
+                self.dewpoint: IndividualForecast = IndividualForecast("dewpoint", json_data)
+                self.relative_humidity: IndividualForecast = IndividualForecast("relativeHumidity", json_data)
+                self.apparent_temperature: IndividualForecast = IndividualForecast("apparentTemperature", json_data)
+                self.wind_speed: IndividualForecast = IndividualForecast("windSpeed", json_data)
+                self.wind_gust: IndividualForecast = IndividualForecast("windGust", json_data)
+                self.probability_of_precipitation: IndividualForecast = IndividualForecast("probabilityOfPrecipitation", json_data)  # , keep_negative=True)
+                self.quantitative_precipitation: IndividualForecast = IndividualForecast("quantitativePrecipitation", json_data, divide=True)  # , keep_negative=True)
+                self.ice_accumulation: IndividualForecast = IndividualForecast("iceAccumulation", json_data, divide=True)  # , keep_negative=True)
+                self.snowfall_amount: IndividualForecast = IndividualForecast("snowfallAmount", json_data, divide=True)  # , keep_negative=True)
+                self.snow_level: IndividualForecast = IndividualForecast("snowLevel", json_data)  # , keep_negative=True)
+                self.pressure: IndividualForecast = IndividualForecast("pressure", json_data)
+                self.center: datetime = forecast_center
+        
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "timestamp": str(self.timestamp),
+                        "update_time": self.update_time,
+                        "temperature": self.temperature.dictify(),
+                        "dewpoint": self.dewpoint.dictify(),
+                        "relative_humidity": self.relative_humidity.dictify(),
+                        "apparent_temperature": self.apparent_temperature.dictify(),
+                        "wind_speed": self.wind_speed.dictify(),
+                        "wind_gust": self.wind_gust.dictify(),
+                        "probability_of_precipitation": self.probability_of_precipitation.dictify(),
+                        "quantatative_precipitation": self.quantitative_precipitation.dictify(),
+                        "ice_accumulation": self.ice_accumulation.dictify(),
+                        "snowfall_amount": self.snowfall_amount.dictify(),
+                        "snow_level": self.snow_level.dictify(),
+                        "pressure": self.pressure.dictify(),
+                        "center": format_datetime(self.center)
+                }
+
+
+class FreezingLevel(object):
+        def __init__(self: Self, json_data: dict[Any, Any]):
+                ...
+
+        def dictify(self: Self) -> dict[Any, Any]:
+                return {}
+
+
+class DailyHydrometerologicalProducts(object):
+        def __init__(self: Self, json_data: dict[Any, Any]):
+                ...
+
+        def dictify(self: Self) -> dict[Any, Any]:
+                return {}
+
+
+class IndividualObservation(object):
+        def __init__(self: Self, name: str, json_data: dict[Any, Any]):
+                self.uom: str = json_data[name]["unitCode"]
+                try:
+                        self.value: int = int(json_data[name]["value"])
+                except TypeError:
+                        self.value: int = 0
+                try:
+                        self.qc: str = json_data[name]["qualityControl"]
+                except KeyError:
+                        self.qc: str = ""
+        
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "uom": self.uom,
+                        "value": self.value,
+                        "qc": self.qc
+                }
+
+
+class Observations(object):
+        def __init__(self: Self, json_data: dict[Any, Any]):
+                self.timestamp: Timestamp = Timestamp()
+                self.update_time: datetime = nws_datetime_str_to_datetime(json_data["timestamp"])
+                self.temperature: IndividualObservation = IndividualObservation("temperature", json_data)
+                self.dewpoint: IndividualObservation = IndividualObservation("dewpoint", json_data)
+                self.relative_humidity: IndividualObservation = IndividualObservation("relativeHumidity", json_data)
+                self.wind_speed: IndividualObservation = IndividualObservation("windSpeed", json_data)
+                self.barometric_pressure: IndividualObservation = IndividualObservation("barometricPressure", json_data)
+                self.max_temperature_last_24_hours: IndividualObservation = IndividualObservation("maxTemperatureLast24Hours", json_data)
+                self.min_temperature_last_24_hours: IndividualObservation = IndividualObservation("minTemperatureLast24Hours", json_data)
+                self.precipitation_last_hour: IndividualObservation = IndividualObservation("precipitationLastHour", json_data)
+                self.precipitation_last_3_hours: IndividualObservation = IndividualObservation("precipitationLast3Hours", json_data)
+                self.precipitation_last_6_hours: IndividualObservation = IndividualObservation("precipitationLast6Hours", json_data)
+                self.apparent_temperature: IndividualObservation
+                at_init: bool = False
+                if "windChill" in json_data:
+                        if json_data["windChill"]["value"] is not None:
+                                self.apparent_temperature = IndividualObservation("windChill", json_data)
+                                at_init = True
+                elif "heatIndex" in json_data:
+                        if json_data["heatIndex"]["value"] is not None:
+                                self.apparent_temperature = IndividualObservation("heatIndex", json_data)
+                                at_init = True
+                if not at_init:
+                        self.apparent_temperature = IndividualObservation("heatIndex", json_data)
+                self.forecast_center: datetime = forecast_center
+
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "timestamp": str(self.timestamp),
+                        "update_time": format_datetime(self.update_time),
+                        "temperature": self.temperature.dictify(),
+                        "dewpoint": self.dewpoint.dictify(),
+                        "relative_humidity": self.relative_humidity.dictify(),
+                        "apparent_temperature": self.apparent_temperature.dictify(),
+                        "wind_speed": self.wind_speed.dictify(),
+                        "barometric_pressure": self.barometric_pressure.dictify(),
+                        "max_temperature_last_24_hours": self.max_temperature_last_24_hours.dictify(),
+                        "min_temperature_last_24_hours": self.min_temperature_last_24_hours.dictify(),
+                        "precipitation_last_hour": self.precipitation_last_hour.dictify(),
+                        "precipitation_last_3_hours": self.precipitation_last_3_hours.dictify(),
+                        "precipitation_last_6_hours": self.precipitation_last_6_hours.dictify(),
+                        "apparent_temperature": self.apparent_temperature.dictify(),
+                        "center": format_datetime(forecast_center)
+                }
+
+
+class Point(object):
+        def __init__(self: Self, latlon_str: str):
+                self.latlon_str: str = latlon_str
+
+        def __str__(self: Self):
+                return self.latlon_str
+
+        def get_grid_data(self: Self):
+                data = call_nws(f"https://api.weather.gov/points/{self.latlon_str}")["properties"]
+                return Gridpoint(data["relativeLocation"]["properties"]["city"],
+                                data["relativeLocation"]["properties"]["state"],
+                                data["gridId"], data["gridX"], data["gridY"], data["radarStation"])
+
+        def get_zone(self: Self):
+                url = f"https://api.weather.gov/zones?type=land&point={self.latlon_str}&include_geometry=false"
+                data = call_nws(url)["features"][0]["properties"]
+                return Zone(data["id"], data["name"])
+
+
+class Gridpoint(object):
+        def __init__(self: Self, mun: str, state: str, wfo: str, grid_x: str, grid_y: str, radar: str):
+                self.timestamp: Timestamp = Timestamp()
+                self.mun: str = mun
+                self.state: str = state
+                self.wfo: str = wfo
+                self.grid_x: str = grid_x
+                self.grid_y: str = grid_y
+                self.radar: str = radar
+
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "timestamp": str(self.timestamp),
+                        "mun": self.mun,
+                        "state": self.state,
+                        "wfo": self.wfo,
+                        "grid_x": self.grid_x,
+                        "grid_y": self.grid_y,
+                        "radar": self.radar
+                }
+
+        @classmethod
+        def undictify(cls: type[Self], data: dict[str, Any]) -> Self:
+                return cls(data["mun"], data["state"], data["wfo"], data["grid_x"], data["grid_y"], data["radar"])
+
+        def get_daily_hydrometerological_products(self: Self):
+                data = call_nws(self.get_product_url("HYD"))
+                return DailyHydrometerologicalProducts(data)
+
+        def get_freezing_level(self: Self):
+                data = call_nws(self.get_product_url("FZL"))
+                return FreezingLevel(data)
+
+        def get_forecast(self: Self):
+                url = f"https://api.weather.gov/gridpoints/{self.wfo}/{self.grid_x},{self.grid_y}"
+                data = call_nws(url)["properties"]
+                return reuse_or_build(url, (data["updateTime"], forecast_center), lambda: Forecast(data))
+
+        def get_product_url(self: Self, product_code: str) -> str:
+                data = call_nws(f"https://api.weather.gov/products?office={self.radar}&type={product_code}&limit=1")
+                return data["@graph"][0]["@id"]
+
+        def get_station(self: Self):
+                data = call_nws(f"https://api.weather.gov/gridpoints/{self.wfo}/{self.grid_x},{self.grid_y}/stations")["features"][0]
+                coordinates = data["geometry"]["coordinates"]
+                point = f"{coordinates[1]:.4f},{coordinates[0]:.4f}"
+                return Station(Point(point), data["properties"]["stationIdentifier"], data["properties"]["name"])
+
+
+class Zone(object):
+        def __init__(self: Self, zone_id: str, name: str):
+                self.timestamp: Timestamp = Timestamp()
+                self.id: str = zone_id
+                self.name: str = name
+        
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "timestamp": str(self.timestamp),
+                        "id": self.id,
+                        "name": self.name
+                }
+
+        @classmethod
+        def undictify(cls: type[Self], data: dict[str, Any]) -> Self:
+                return cls(data["id"], data["name"])
+
+
+class Station(object):
+        def __init__(self: Self, latlon: Point, station_id: str, name: str):
+                self.timestamp: Timestamp = Timestamp()
+                self.latlon: Point = latlon
+                self.id: str = station_id
+                self.name: str = name
+        
+        def dictify(self: Self):
+                return {
+                        "timestamp": str(self.timestamp),
+                        "latlon": str(self.latlon),
+                        "id": self.id,
+                        "name": self.name
+                }
+
+        @classmethod
+        def undictify(cls: type[Self], data: dict[str, Any]) -> Self:
+                return cls(Point(data["latlon"]), data["id"], data["name"])
+
+        def get_control(self: Self):
+                return Control(self.latlon)
+
+        def get_observations(self: Self):
+                url = f"https://api.weather.gov/stations/{self.id}/observations/latest"
+                data = call_nws(url)["properties"]
+                return reuse_or_build(url, (data["timestamp"], forecast_center), lambda: Observations(data))
+
+
+class Control(object):
+        def __init__(self: Self, latlon: Point, grid_data: Gridpoint | None = None):
+                self.timestamp: Timestamp = Timestamp()
+                self.latlon: Point = latlon
+                self.grid_data: Gridpoint
+                if grid_data is None:
+                        self.grid_data = cached_grid_data(self.latlon)
+                else:
+                        self.grid_data = grid_data
+                self.forecast: Forecast = self.grid_data.get_forecast()
+        
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "timestamp": str(self.timestamp),
+                        "latlon": str(self.latlon),
+                        "grid_data": self.grid_data.dictify(),
+                        "forecast": self.forecast.dictify()
+                }
+
+
+class ThreeNumberSummary(object):
+        def __init__(self: Self, forecast: Forecast, observations: Observations):
+                self.timestamp: Timestamp = Timestamp()
+                self.quantitative_precipitation: IndividualForecast = forecast.quantitative_precipitation
+                self.precipitation_last_6_hours: IndividualObservation = observations.precipitation_last_6_hours
+                self.temperature: IndividualForecast = forecast.temperature
+                self.forecast_center: datetime = forecast.center
+
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "timestamp": str(self.timestamp),
+                        "quantitative_precipitation": self.quantitative_precipitation.dictify(),
+                        "precipitation_last_6_hours": self.precipitation_last_6_hours.dictify(),
+                        "temperature": self.temperature.dictify(),
+                        "forecast_center": format_datetime(self.forecast_center)
+                }
+
+        def model_a_data_windows(self: Self, starts: np.ndarray[Any, Any], hours: int = 8) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+                snowfall, _ = self.quantitative_precipitation.window_sums(starts, hours)
+                # the 6 hours before a window are observed up to the center and forecast after it; the forecast starts at offset 0,
+                # so its sum already stops there and the observed total fills the share of the 6 hours that fell before it
+                forecast_snow_on_ground, _ = self.quantitative_precipitation.window_sums(starts - 6, 6)
+                observed_hours = np.clip(6 - starts, 0, 6)
+                snow_on_ground = float(self.precipitation_last_6_hours.value) * observed_hours / 6 + forecast_snow_on_ground
+                temperature_sums, temperature_counts = self.temperature.window_sums(starts, hours)
+                temperature = temperature_sums / np.maximum(temperature_counts, 1)
+                return snowfall, snow_on_ground, temperature
+
+        def model_a_data_today(self: Self) -> tuple[float, float, float]:
+                snowfall, snow_on_ground, temperature = self.model_a_data_windows(np.zeros(1, dtype=np.int64))
+                return float(snowfall[0]), float(snow_on_ground[0]), float(temperature[0])
+
+        def horizon(self: Self) -> int:
+                return min(self.quantitative_precipitation.horizon(), self.temperature.horizon())
+
+        def school_day_starts(self: Self, days: int) -> list[tuple[str, int]]:
+                horizon = self.horizon()
+                school_days: list[tuple[str, int]] = []
+                for day in range(days):
+                        date = self.forecast_center.date() + timedelta(days=day)
+                        # counted from the local 6 am, not day * 24, so a daylight saving change does not shift the window
+                        start = hours_after_center(est.localize(datetime.combine(date, time(6, 0, 0))))
+                        if start + 8 > horizon:
+                                break
+                        if date.weekday() < 5:
+                                school_days.append((date.isoformat(), start))
+                return school_days
+
+
+class Location(object):
+        def __init__(self: Self, latlon: Point, grid_data: Gridpoint | None = None, station: Station | None = None, control: Control | None = None, zone: Zone | None = None, previous: "Location | None" = None):
+                fetcher = get_fetcher()
+                self.timestamp: Timestamp = Timestamp()
+                self.latlon: Point = latlon
+                grid_data_future = provided(grid_data) if grid_data is not None else fetcher.submit("grid_data", cached_grid_data, self.latlon)
+                zone_future = provided(zone) if zone is not None else fetcher.submit("zone", cached_zone, self.latlon)
+                self.grid_data: Gridpoint = grid_data_future.result()
+                station_future = provided(station) if station is not None else fetcher.submit("station", cached_station, self.latlon, self.grid_data)
+                forecast_future = fetcher.submit("forecast", self.grid_data.get_forecast)
+                hyd_future = fetcher.submit("daily_hydrometerological_products", self.grid_data.get_daily_hydrometerological_products)
+                fzl_future = fetcher.submit("freezing_level", self.grid_data.get_freezing_level)
+                self.station: Station = station_future.result()
+                control_future = provided(control) if control is not None else fetcher.submit("control", self.station.get_control)
+                observations_future = fetcher.submit("observations", self.station.get_observations)
+                self.zone: Zone = zone_future.result()
+                self.forecast: Forecast = forecast_future.result()
+                self.control: Control = control_future.result()
+                self.observations: Observations = observations_future.result()
+                self.daily_hydrometerological_products: DailyHydrometerologicalProducts = hyd_future.result()
+                self.freezing_level: FreezingLevel = fzl_future.result()
+                self.three_number_summary: ThreeNumberSummary
+                self.model_a_prediction_today: float
+                self.model_a_school_days: list[dict[str, Any]]
+                self.model_a_rolling: list[list[float]] | None
+                if previous is not None and previous.inputs() == self.inputs():
+                        built_total.inc("Location", "reused")
+                        self.three_number_summary = previous.three_number_summary
+                        self.model_a_prediction_today = previous.model_a_prediction_today
+                        self.model_a_school_days = previous.model_a_school_days
+                        self.model_a_rolling = previous.model_a_rolling
+                        return
+                built_total.inc("Location", "built")
+                self.three_number_summary = ThreeNumberSummary(self.forecast, self.observations)
+                with fetcher.stage("model_a"):
+                        self.predict()
+
+        def predict(self: Self):
+                settings = get_prediction_settings()
+                school_days = self.three_number_summary.school_day_starts(settings.get("days", 7))
+                rolling_starts: list[int] = []
+                if settings.get("rolling_windows", False):
+                        rolling_starts = list(range(self.three_number_summary.horizon() - 7))
+                # today, every school day and every rolling window go through the engine as one batch
+                starts = np.array([0] + [start for _, start in school_days] + rolling_starts, dtype=np.int64)
+                predictions = models.model_a_engine.predict_batch(*self.three_number_summary.model_a_data_windows(starts))
+                predictions_total.inc(amount=len(starts))
+                self.model_a_prediction_today = float(predictions[0])
+                self.model_a_school_days = [{"date": date, "model_a": float(prediction)} for (date, _), prediction in zip(school_days, predictions[1:])]
+                self.model_a_rolling = None
+                if rolling_starts:
+                        self.model_a_rolling = [[start, float(prediction)] for start, prediction in zip(rolling_starts, predictions[1 + len(school_days):])]
+
+        def inputs(self: Self) -> tuple[int, ...]:
+                # forecasts and observations are reused objects while nws reports no update, so identity is enough
+                return id(self.forecast), id(self.control.forecast), id(self.observations)
+
+        def dictify(self: Self) -> dict[str, Any]:
+                return {
+                        "timestamp": str(self.timestamp),
+                        "latlon": str(self.latlon),
+                        "grid_data": self.grid_data.dictify(),
+                        "station": self.station.dictify(),
+                        "control": self.control.dictify(),
+                        "zone": self.zone.dictify(),
+                        "forecast": self.forecast.dictify(),
+                        "observations": self.observations.dictify(),
+                        "daily_hydrometerological_products": self.daily_hydrometerological_products.dictify(),
+                        "freezing_level": self.freezing_level.dictify(),
+                        "three_number_summary": self.three_number_summary.dictify(),
+                        "model_a_prediction_today": self.model_a_prediction_today
+                }
+
+        def predictions_dictify(self: Self) -> dict[str, Any]:
+                predictions: dict[str, Any] = {
+                        "latlon": str(self.latlon),
+                        "model_a_today": self.model_a_prediction_today,
+                        "model_a_school_days": self.model_a_school_days
+                }
+                if self.model_a_rolling is not None:
+                        predictions["model_a_rolling"] = self.model_a_rolling
+                return predictions
+
+
+def refresh():
+        global forecast_center
+        forecast_center = set_forecast_center()
+
+
+def dump_profiles(fetcher: Fetcher, path: str):
+        profiles = fetcher.profiles or []
+        if not profiles:
+                return
+        stats = Stats(profiles[0])
+        for profile in profiles[1:]:
+                stats.add(profile)
+        stats.dump_stats(path)
+
+
+def main(publish_snapshots: bool = True) -> dict[str, dict[str, float]]:
+        fetcher = get_fetcher()
+        profile_settings = get_settings().get("profile", {})
+        fetcher.begin_cycle(profile=profile_settings.get("enabled", False))
+        begin_built_cycle()
+        get_metadata_cache().reload_if_changed()
+        with fetcher.stage("locations"):
+                locations = fetcher.map_locations(lambda p: Location(Point(p), previous=built_locations.get(p)), get_forecast_points())
+        built_locations.clear()
+        built_locations.update((str(loc.latlon), loc) for loc in locations)
+        with fetcher.stage("serialize"):
+                payloads = {
+                        "raw.json": dumps([loc.dictify() for loc in locations]).encode(),
+                        "summary.json": dumps([loc.three_number_summary.dictify() for loc in locations]).encode(),
+                        "predictions.json": dumps([loc.predictions_dictify() for loc in locations]).encode()
+                }
+        with fetcher.stage("publish"):
+                for name, body in payloads.items():
+                        write_atomic(name, body)
+                        # a worker process has no routes to serve them, the web process publishes from the files instead
+                        if publish_snapshots:
+                                publish(name, body)
+        get_metadata_cache().flush()
+        fetcher.end_cycle()
+        dump_profiles(fetcher, profile_settings.get("path", "refresh.prof"))
+        return fetcher.timings.dictify()
+
+
+forecast_center: datetime = set_forecast_center()
+
+
+if __name__ == "__main__":
+        if sys.argv[1:2] == ["invalidate"]:
+                # python nws.py invalidate [latlon_str] [grid_data|station|zone]
+                invalidate_metadata(*(arg or None for arg in sys.argv[2:4]))
+        else:
+                refresh()
+                print(dumps(main(), indent=8))  # todo hyd and fzl
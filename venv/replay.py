@@ -0,0 +1,179 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+from json import dumps, loads
+from os import makedirs, path
+from random import Random
+from requests import PreparedRequest, Response, Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from snapshots import write_atomic
+from threading import Lock
+from time import sleep
+from typing import Any, Self
+from urllib.parse import parse_qs, urlsplit
+
+
+NWS_PREFIX: str = "https://api.weather.gov"
+KEPT_HEADERS: tuple[str, ...] = ("Content-Type", "ETag", "Last-Modified")
+
+
+def fixture_name(url: str) -> str:
+        return f"{blake2b(url.encode(), digest_size=12).hexdigest()}.json"
+
+
+class RecordingAdapter(HTTPAdapter):
+        def __init__(self: Self, directory: str, **kwargs: Any):
+                super().__init__(**kwargs)
+                self.directory: str = directory
+                makedirs(directory, exist_ok=True)
+
+        def send(self: Self, request: PreparedRequest, **kwargs: Any) -> Response:
+                response = super().send(request, **kwargs)
+                # only full bodies are worth replaying; a 304 would overwrite a good fixture with nothing
+                if response.status_code == 200:
+                        fixture = {
+                                "url": request.url,
+                                "status": response.status_code,
+                                "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+                                "body": response.text
+                        }
+                        write_atomic(path.join(self.directory, fixture_name(request.url)), dumps(fixture).encode())
+                return response
+
+
+class StandInAdapter(BaseAdapter, ABC):
+        def __init__(self: Self, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 503, seed: int | None = None):
+                super().__init__()
+                self.latency: float = latency
+                self.error_rate: float = error_rate
+                self.error_status: int = error_status
+                self.random_lock: Lock = Lock()
+                self.random: Random = Random(seed)
+
+        @abstractmethod
+        def respond(self: Self, url: str) -> tuple[int, dict[str, str], bytes]:
+                ...
+
+        def send(self: Self, request: PreparedRequest, **kwargs: Any) -> Response:
+                with self.random_lock:
+                        failed = self.random.random() < self.error_rate
+                if self.latency:
+                        sleep(self.latency)
+                if failed:
+                        status, headers, body = self.error_status, {}, b""
+                else:
+                        status, headers, body = self.respond(request.url)
+                        if status == 200 and "ETag" in headers and request.headers.get("If-None-Match") == headers["ETag"]:
+                                status, body = 304, b""
+                response = Response()
+                response.status_code = status
+                response.headers = CaseInsensitiveDict(headers)
+                response._content = body
+                response.encoding = "utf-8"
+                response.url = request.url
+                response.request = request
+                return response
+
+        def close(self: Self):
+                pass
+
+
+class ReplayAdapter(StandInAdapter):
+        def __init__(self: Self, directory: str, **kwargs: Any):
+                super().__init__(**kwargs)
+                self.directory: str = directory
+
+        def respond(self: Self, url: str) -> tuple[int, dict[str, str], bytes]:
+                try:
+                        with open(path.join(self.directory, fixture_name(url)), "r") as file:
+                                fixture = loads(file.read())
+                except FileNotFoundError:
+                        return 404, {}, b""
+                return fixture["status"], fixture["headers"], fixture["body"].encode()
+
+
+def synthetic_point(index: int) -> str:
+        return f"{43 + index // 100 * 0.01:.4f},{-70 + index % 100 * 0.01:.4f}"
+
+
+class SyntheticAdapter(StandInAdapter):
+        def __init__(self: Self, **kwargs: Any):
+                super().__init__(**kwargs)
+                # utc clocks with a +00:00 offset, the way nws sends them
+                now = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+                self.gridpoint_body: bytes = dumps({"properties": self.gridpoint(now)}).encode()
+                self.observation_body: bytes = dumps({"properties": self.observation(now)}).encode()
+                self.etags: dict[str, str] = {
+                        "gridpoint": f'"{blake2b(self.gridpoint_body, digest_size=8).hexdigest()}"',
+                        "observation": f'"{blake2b(self.observation_body, digest_size=8).hexdigest()}"'
+                }
+
+        @staticmethod
+        def gridpoint(now: datetime) -> dict[str, Any]:
+                def series(base: float, swing: float, step: int = 1) -> dict[str, Any]:
+                        values = []
+                        for hour in range(-6, 162, step):
+                                valid_time = (now + timedelta(hours=hour)).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+                                values.append({"validTime": f"{valid_time}/PT{step}H", "value": base + swing * (hour % 24) / 24})
+                        return {"uom": "wmoUnit:unknown", "values": values}
+
+                fields = ("temperature", "dewpoint", "relativeHumidity", "apparentTemperature", "windSpeed", "windGust", "probabilityOfPrecipitation",
+                          "iceAccumulation", "snowfallAmount", "snowLevel", "pressure")
+                properties = {field: series(-3, 4) for field in fields}
+                properties["quantitativePrecipitation"] = series(2, 6, step=6)
+                properties["updateTime"] = now.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+                return properties
+
+        @staticmethod
+        def observation(now: datetime) -> dict[str, Any]:
+                fields = ("temperature", "dewpoint", "relativeHumidity", "windSpeed", "barometricPressure", "maxTemperatureLast24Hours",
+                          "minTemperatureLast24Hours", "precipitationLastHour", "precipitationLast3Hours", "precipitationLast6Hours", "windChill")
+                properties: dict[str, Any] = {field: {"unitCode": "wmoUnit:unknown", "value": 4.0, "qualityControl": "V"} for field in fields}
+                properties["timestamp"] = now.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+                return properties
+
+        def respond(self: Self, url: str) -> tuple[int, dict[str, str], bytes]:
+                parts = urlsplit(url)
+                segments = parts.path.strip("/").split("/")
+                query = parse_qs(parts.query)
+                headers = {"Content-Type": "application/geo+json"}
+                data: dict[str, Any]
+                # every synthetic point gets its own gridpoint and station, so nothing is shared that would not be in production
+                if segments == [""]:
+                        data = {"status": "OK"}
+                elif segments[0] == "points":
+                        lat, lon = (float(part) for part in segments[1].split(","))
+                        grid_x = round((lon + 70) * 100) + round((lat - 43) * 100) * 100
+                        data = {"properties": {"relativeLocation": {"properties": {"city": "Synthetic", "state": "ME"}},
+                                               "gridId": "SYN", "gridX": grid_x, "gridY": 0, "radarStation": "KSYN"}}
+                elif segments[0] == "zones":
+                        data = {"features": [{"properties": {"id": f"MEZ{query['point'][0]}", "name": "Synthetic"}}]}
+                elif segments[0] == "gridpoints" and segments[-1] == "stations":
+                        point = synthetic_point(int(segments[2].split(",")[0]))
+                        lat, lon = point.split(",")
+                        data = {"features": [{"geometry": {"coordinates": [float(lon), float(lat)]},
+                                              "properties": {"stationIdentifier": f"S{segments[2].split(',')[0]}", "name": "Synthetic"}}]}
+                elif segments[0] == "gridpoints":
+                        return 200, {**headers, "ETag": self.etags["gridpoint"]}, self.gridpoint_body
+                elif segments[0] == "stations":
+                        return 200, {**headers, "ETag": self.etags["observation"]}, self.observation_body
+                elif segments[0] == "products" and len(segments) == 1:
+                        data = {"@graph": [{"@id": f"{NWS_PREFIX}/products/{query['type'][0]}"}]}
+                elif segments[0] == "products":
+                        data = {"productText": ""}
+                else:
+                        return 404, {}, b""
+                return 200, headers, dumps(data).encode()
+
+
+def install(session: Session, settings: dict[str, Any], pool_options: dict[str, int] | None = None):
+        mode = settings.get("mode", "off")
+        options = {key: settings[key] for key in ("latency", "error_rate", "error_status", "seed") if key in settings}
+        directory = settings.get("directory", "fixtures")
+        if mode == "record":
+                session.mount(NWS_PREFIX, RecordingAdapter(directory, **(pool_options or {})))
+        elif mode == "replay":
+                session.mount(NWS_PREFIX, ReplayAdapter(directory, **options))
+        elif mode == "synthetic":
+                session.mount(NWS_PREFIX, SyntheticAdapter(**options))
@@ -0,0 +1,149 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, time as clock_time, timedelta
+from multiprocessing import get_context
+from random import uniform
+from threading import Event, Lock, Thread
+from time import perf_counter, time
+from typing import Any, Callable, Self
+import metrics
+import nws
+
+
+run_seconds: metrics.Histogram = metrics.histogram("refresh_run_seconds", "Wall time of whole refresh runs.", ("reason",), (1, 5, 10, 30, 60, 120, 300, 600, 1800))
+runs_total: metrics.Counter = metrics.counter("refresh_runs_total", "Refresh runs by reason and outcome.", ("reason", "outcome"))
+worker_restarts_total: metrics.Counter = metrics.counter("refresh_worker_restarts_total", "Refresh worker processes replaced after dying.")
+
+
+def format_epoch(epoch: float | None) -> str | None:
+        if epoch is None:
+                return None
+        return datetime.fromtimestamp(epoch, nws.est).isoformat(timespec="seconds")
+
+
+def next_decision(now: float, hour: int = 6) -> float:
+        moment = datetime.fromtimestamp(now, nws.est)
+        decision = nws.est.localize(datetime.combine(moment.date(), clock_time(hour, 0, 0)))
+        if decision.timestamp() <= now:
+                decision = nws.est.localize(datetime.combine(moment.date() + timedelta(days=1), clock_time(hour, 0, 0)))
+        return decision.timestamp()
+
+
+class Scheduler(object):
+        def __init__(self: Self, job: Callable[[], Any], interval: float = 1800, offset: float = 300, jitter: float = 30, decision_hour: int = 6, decision_lead: float = 900):
+                self.job: Callable[[], Any] = job
+                self.interval: float = interval
+                self.offset: float = offset
+                self.jitter: float = jitter
+                self.decision_hour: int = decision_hour
+                self.decision_lead: float = decision_lead
+                self.run_lock: Lock = Lock()
+                self.wake: Event = Event()
+                self.stopped: bool = False
+                self.thread: Thread | None = None
+                self.next_run: float | None = None
+                self.next_reason: str | None = None
+                self.last_start: float | None = None
+                self.last_end: float | None = None
+                self.last_error: str | None = None
+                self.last_result: Any = None
+                self.runs: deque[dict[str, Any]] = deque(maxlen=48)
+
+        def plan(self: Self, now: float) -> tuple[float, str]:
+                # ticks sit on fixed wall-clock slots (offset past each interval boundary), so run time never drifts
+                tick = ((now - self.offset) // self.interval + 1) * self.interval + self.offset + uniform(0, self.jitter)
+                decision = next_decision(now, self.decision_hour) - self.decision_lead
+                if now < decision < tick:
+                        return decision, "decision"
+                return tick, "tick"
+
+        def run(self: Self, reason: str) -> bool:
+                if not self.run_lock.acquire(blocking=False):
+                        return False
+                try:
+                        self.last_start = time()
+                        start = perf_counter()
+                        error = None
+                        try:
+                                self.last_result = self.job()
+                        except Exception as exception:
+                                error = f"{type(exception).__name__}: {exception}"
+                        duration = perf_counter() - start
+                        self.last_end = time()
+                        self.last_error = error
+                        self.runs.append({
+                                "reason": reason,
+                                "start": format_epoch(self.last_start),
+                                "duration": duration,
+                                "error": error
+                        })
+                        run_seconds.observe(duration, reason)
+                        runs_total.inc(reason, "error" if error else "ok")
+                        return True
+                finally:
+                        self.run_lock.release()
+
+        def loop(self: Self):
+                self.run("startup")
+                while not self.stopped:
+                        self.next_run, self.next_reason = self.plan(time())
+                        # a run that overruns its slot just lands on the next free one instead of stacking up
+                        while not self.stopped and time() < self.next_run:
+                                self.wake.wait(self.next_run - time())
+                        if not self.stopped:
+                                self.run(self.next_reason)
+
+        def start(self: Self) -> Thread:
+                self.thread = Thread(target=self.loop, name="scheduler", daemon=True)
+                self.thread.start()
+                return self.thread
+
+        def stop(self: Self):
+                self.stopped = True
+                self.wake.set()
+
+        def status(self: Self) -> dict[str, Any]:
+                return {
+                        "running": self.run_lock.locked(),
+                        "last_start": format_epoch(self.last_start),
+                        "last_end": format_epoch(self.last_end),
+                        "last_error": self.last_error,
+                        "next_run": format_epoch(self.next_run),
+                        "next_reason": self.next_reason,
+                        "runs": list(self.runs)
+                }
+
+
+def refresh_cycle(publish_snapshots: bool = True) -> dict[str, dict[str, float]]:
+        nws.refresh()
+        return nws.main(publish_snapshots)
+
+
+def worker_cycle() -> tuple[dict[str, dict[str, float]], str]:
+        return refresh_cycle(publish_snapshots=False), metrics.render()
+
+
+class WorkerJob(object):
+        def __init__(self: Self, on_done: Callable[[], None]):
+                # spawn keeps the worker clear of the web process's threads and flask state; the single process is reused
+                # across cycles so its fetcher, caches and built objects survive between runs
+                self.executor: ProcessPoolExecutor = self.make_executor()
+                self.on_done: Callable[[], None] = on_done
+                self.metrics: str = ""
+
+        @staticmethod
+        def make_executor() -> ProcessPoolExecutor:
+                return ProcessPoolExecutor(1, mp_context=get_context("spawn"))
+
+        def __call__(self: Self) -> dict[str, dict[str, float]]:
+                try:
+                        timings, self.metrics = self.executor.submit(worker_cycle).result()
+                except BrokenProcessPool:
+                        # the worker died (oom, segfault); a broken pool never recovers, so start a fresh one and retry once
+                        self.executor.shutdown(wait=False)
+                        self.executor = self.make_executor()
+                        worker_restarts_total.inc()
+                        timings, self.metrics = self.executor.submit(worker_cycle).result()
+                self.on_done()
+                return timings
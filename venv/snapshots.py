@@ -0,0 +1,72 @@
+from email.utils import formatdate
+from gzip import compress
+from hashlib import blake2b
+from os import chmod, fdopen, path, replace
+from tempfile import mkstemp
+from threading import Lock
+from time import time
+from typing import Self
+
+try:
+        import brotli
+except ImportError:
+        brotli = None
+
+
+content_types: dict[str, str] = {
+        "css": "text/css; charset=utf-8",
+        "html": "text/html; charset=utf-8",
+        "json": "application/json"
+}
+
+
+class Snapshot(object):
+        def __init__(self: Self, name: str, body: bytes, modified: float | None = None):
+                self.name: str = name
+                self.body: bytes = body
+                self.content_type: str = content_types.get(name.rsplit(".", 1)[-1], "application/octet-stream")
+                digest = blake2b(body, digest_size=16).hexdigest()
+                self.etag: str = f'"{digest}"'
+                # strong validators have to differ per content-coding, since the bytes on the wire differ
+                self.etags: dict[str, str] = {"identity": self.etag, "gzip": f'"{digest}-gzip"', "br": f'"{digest}-br"'}
+                self.modified: float = time() if modified is None else modified
+                self.last_modified: str = formatdate(self.modified, usegmt=True)
+                # mtime=0 keeps the gzip bytes a pure function of the body
+                self.gzip: bytes = compress(body, 6, mtime=0)
+                # quality 11 (the default) takes minutes on a 90 MB raw.json; 5 keeps most of the ratio at a fraction of the cost
+                self.brotli: bytes | None = brotli.compress(body, quality=5) if brotli is not None else None
+
+
+snapshots: dict[str, Snapshot] = {}
+publish_lock: Lock = Lock()
+
+
+def get(name: str) -> Snapshot | None:
+        return snapshots.get(name)
+
+
+def publish(name: str, body: bytes, modified: float | None = None) -> Snapshot:
+        global snapshots
+        snapshot = Snapshot(name, body, modified)
+        # readers never lock; they see either the old dict or the new one, never a half-built one
+        with publish_lock:
+                published = dict(snapshots)
+                published[name] = snapshot
+                snapshots = published
+        return snapshot
+
+
+def publish_file(path: str) -> Snapshot:
+        with open(path, "rb") as file:
+                body = file.read()
+        return publish(path, body)
+
+
+def write_atomic(target: str, body: bytes):
+        # a temporary file of its own per writer, so a hand run of nws.py and the server's refresh never share one
+        descriptor, temporary = mkstemp(prefix=f"{path.basename(target)}.", suffix=".tmp", dir=path.dirname(path.abspath(target)))
+        with fdopen(descriptor, "wb") as file:
+                file.write(body)
+        # mkstemp makes the file private; the published outputs should stay readable like before
+        chmod(temporary, 0o644)
+        replace(temporary, target)